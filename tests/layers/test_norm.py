@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from tfimm.layers import FusedLayerNormalization
+
+
+@pytest.mark.parametrize("dtype", ["float32", "mixed_bfloat16"])
+def test_fused_layer_norm(dtype):
+    """FusedLayerNormalization should match the Keras layer."""
+    x = tf.random.normal((2, 5, 8), mean=1.0, stddev=2.0)
+    layer = FusedLayerNormalization(epsilon=1e-6, dtype=dtype)
+    layer(x)
+    layer.set_weights([np.random.rand(8), np.random.rand(8)])
+    y = layer(x)
+
+    ref_layer = tf.keras.layers.LayerNormalization(epsilon=1e-6, dtype=dtype)
+    ref_layer(x)
+    ref_layer.set_weights(layer.get_weights())
+    y_ref = ref_layer(x)
+
+    assert y.dtype == y_ref.dtype
+    y, y_ref = tf.cast(y, tf.float32).numpy(), tf.cast(y_ref, tf.float32).numpy()
+    assert np.allclose(y, y_ref, atol=1e-5 if dtype == "float32" else 1e-2)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from tfimm.layers import QuantizedDense, fp8_quantize
+
+
+def test_fp8_quantize():
+    x = tf.random.uniform((64, 64), minval=-2.0, maxval=2.0)
+    y = fp8_quantize(x)
+    assert y.dtype == x.dtype
+
+    # float8_e4m3fn has 3 mantissa bits, i.e., relative error is at most 2^-4. The
+    # absolute tolerance accounts for values in the subnormal range.
+    x, y = x.numpy(), y.numpy()
+    assert np.all(np.abs(x - y) <= 2**-4 * np.abs(x) + 1e-3)
+    # Largest value is mapped to FP8 maximum, which is represented exactly
+    assert np.isclose(np.max(np.abs(y)), np.max(np.abs(x)))
+
+
+def test_quantized_dense():
+    x = tf.random.uniform((4, 16))
+    layer = QuantizedDense(units=8, quantization="fp8")
+    y = layer(x)
+
+    dense = tf.keras.layers.Dense(units=8)
+    dense(x)
+    dense.set_weights([layer.kernel.numpy(), layer.bias.numpy()])
+    y_ref = dense(x)
+    assert np.allclose(y.numpy(), y_ref.numpy(), rtol=0.1, atol=0.1)
+
+
+def test_quantized_dense_quantize_weights():
+    """The kernel is quantized once and only updated via ``quantize_weights``."""
+    x = tf.random.uniform((4, 16))
+    layer = QuantizedDense(units=8, quantization="fp8")
+    layer(x)
+    assert [w.name.split("/")[-1] for w in layer.weights] == [
+        "kernel:0",
+        "bias:0",
+        "quantized_kernel:0",
+    ]
+    assert np.allclose(layer.quantized_kernel.numpy(), fp8_quantize(layer.kernel))
+
+    layer.kernel.assign(2.0 * layer.kernel)
+    assert not np.allclose(layer.quantized_kernel.numpy(), fp8_quantize(layer.kernel))
+    layer.quantize_weights()
+    assert np.allclose(layer.quantized_kernel.numpy(), fp8_quantize(layer.kernel))
+
+
+def test_quantized_dense_unknown_quantization():
+    with pytest.raises(ValueError):
+        QuantizedDense(units=8, quantization="int3")
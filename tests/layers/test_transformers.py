@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from tfimm.layers import MLP, PatchEmbeddings, PatchProjection
+
+
+@pytest.mark.parametrize(
+    "input_size, patch_size, strides",
+    [
+        ((32, 32), 8, 8),  # Non-overlapping patches, computed via matmul
+        ((30, 34), 8, 8),  # Input size not divisible by patch size
+        ((32, 32), 1, 1),
+        ((32, 32), 7, 4),  # Overlapping patches, computed via convolution
+    ],
+)
+def test_patch_projection(input_size, patch_size, strides):
+    """PatchProjection should give the same results as a convolution."""
+    x = tf.random.uniform((2, *input_size, 3))
+    layer = PatchProjection(
+        filters=6, kernel_size=patch_size, strides=strides, bias_initializer="ones"
+    )
+    y = layer(x)
+
+    conv = tf.keras.layers.Conv2D(filters=6, kernel_size=patch_size, strides=strides)
+    conv(x)
+    conv.set_weights(layer.get_weights())
+    y_ref = conv(x)
+
+    assert y.shape == y_ref.shape
+    assert np.allclose(y.numpy(), y_ref.numpy(), atol=1e-5)
+
+
+def test_patch_embeddings_static_shape():
+    """For fixed input size, only the batch dimension should be dynamic."""
+    layer = PatchEmbeddings(patch_size=4, embed_dim=6)
+
+    @tf.function(input_signature=[tf.TensorSpec((None, 16, 12, 3), tf.float32)])
+    def _embed(x):
+        x, grid_size = layer(x, return_shape=True)
+        assert x.shape.as_list() == [None, 12, 6]
+        assert grid_size == (4, 3)
+        return x
+
+    _embed(tf.zeros((2, 16, 12, 3)))
+
+
+@pytest.mark.parametrize("drop_rate", [0.0, 0.1])
+def test_mlp_no_dropout(drop_rate):
+    """Without dropout, the inference graph should not contain no-op dropout nodes."""
+    layer = MLP(hidden_dim=8, embed_dim=4, drop_rate=drop_rate, act_layer="gelu")
+
+    @tf.function(input_signature=[tf.TensorSpec((2, 3, 4), tf.float32)])
+    def _mlp(x):
+        return layer(x, training=False)
+
+    graph = _mlp.get_concrete_function().graph
+    nb_identity = sum(op.type == "Identity" for op in graph.get_operations())
+    # One identity op is always added for the function output
+    assert (nb_identity == 1) == (drop_rate == 0.0)
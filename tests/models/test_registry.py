@@ -0,0 +1,71 @@
+import sys
+
+import pytest
+
+import tfimm.models.registry as registry
+from tfimm.architectures import ResNet, ResNetConfig
+from tfimm.models import (
+    is_model,
+    is_model_pretrained,
+    list_models,
+    model_class,
+    model_config,
+    register_model,
+)
+
+
+@pytest.fixture
+def clean_registry(monkeypatch):
+    """Models registered within a test are removed from the registry afterwards."""
+    monkeypatch.setattr(
+        registry, "_model_entrypoints", dict(registry._model_entrypoints)
+    )
+    monkeypatch.setattr(registry, "_model_class", dict(registry._model_class))
+    monkeypatch.setattr(registry, "_model_config", dict(registry._model_config))
+    module_to_models = registry.defaultdict(set)
+    for module, models in registry._module_to_models.items():
+        module_to_models[module] = set(models)
+    monkeypatch.setattr(registry, "_module_to_models", module_to_models)
+    # `register_model` adds the model name to `__all__` of the defining module
+    monkeypatch.setattr(sys.modules[__name__], "__all__", [], raising=False)
+
+
+def test_lazy_registration(clean_registry):
+    """Entrypoints should be called only when the model is used."""
+    nb_calls = []
+
+    @register_model
+    def lazy_test_model():
+        nb_calls.append(1)
+        cfg = ResNetConfig(name="lazy_test_model", url="[timm]")
+        return ResNet, cfg
+
+    assert is_model("lazy_test_model")
+    assert "lazy_test_model" in list_models("lazy_*")
+    assert len(nb_calls) == 0
+
+    assert model_class("lazy_test_model") is ResNet
+    assert model_config("lazy_test_model").name == "lazy_test_model"
+    assert is_model_pretrained("lazy_test_model")
+    assert len(nb_calls) == 1
+
+
+def test_wrong_model_name(clean_registry):
+    """A broken entrypoint fails when used, but does not break listing models."""
+
+    @register_model
+    def wrong_name_test_model():
+        cfg = ResNetConfig(name="other_name", url="[timm]")
+        return ResNet, cfg
+
+    assert is_model("wrong_name_test_model")
+    with pytest.raises(ValueError):
+        model_config("wrong_name_test_model")
+
+    models = list_models(pretrained=True)
+    assert len(models) > 0
+    assert "wrong_name_test_model" not in models
+
+
+def test_is_model_pretrained_unknown_model():
+    assert not is_model_pretrained("unknown_test_model")
@@ -0,0 +1,203 @@
+import tempfile
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from tfimm.architectures.vit import (
+    ViTConfig,
+    ViTQKVProjection,
+    register_attn_implementation,
+)
+from tfimm.layers import fp8_quantize
+from tfimm.models.factory import create_model, transfer_weights
+
+from . import architectures  # noqa: F401
+
+
+@pytest.mark.parametrize("model_name", ["vit_test_model", "deit_test_model"])
+@pytest.mark.parametrize(
+    "overrides, tol",
+    [
+        ({"attn_implementation": "xla"}, 1e-5),
+        ({"jit_compile": True}, 1e-5),
+        ({"pad_classifier": True}, 1e-5),
+        ({"norm_layer": "fused_layer_norm_eps_1e-6"}, 1e-5),
+        ({"act_layer": "gelu_tanh"}, 1e-2),  # Approximation of exact GELU
+    ],
+)
+def test_equivalent_config(model_name, overrides, tol):
+    """Config options for efficiency should not change the model output."""
+    model = create_model(model_name)
+    model_2 = create_model(model_name, **overrides)
+    transfer_weights(model, model_2)
+
+    img = np.random.rand(2, *model.cfg.input_size, model.cfg.in_channels)
+    y_1 = model(img).numpy()
+    y_2 = model_2(img).numpy()
+    assert y_1.shape == y_2.shape
+    assert np.allclose(y_1, y_2, rtol=tol, atol=tol)
+
+
+def test_custom_attn_implementation():
+    """Registered attention implementations can be selected via the config."""
+    calls = []
+
+    def _attention(q, k, v, scale):
+        calls.append(q.shape)
+        attn = tf.nn.softmax(scale * tf.linalg.matmul(q, k), axis=-1)
+        return tf.linalg.matmul(attn, v)
+
+    register_attn_implementation("test_attention", _attention)
+    model = create_model("vit_test_model")
+    custom_model = create_model("vit_test_model", attn_implementation="test_attention")
+    transfer_weights(model, custom_model)
+
+    img = np.random.rand(2, *model.cfg.input_size, model.cfg.in_channels)
+    y_1 = model(img).numpy()
+    y_2 = custom_model(img).numpy()
+    assert len(calls) > 0
+    assert np.allclose(y_1, y_2, rtol=1e-5, atol=1e-5)
+
+    with pytest.raises(ValueError):
+        create_model("vit_test_model", attn_implementation="unknown")
+
+
+@pytest.mark.parametrize("use_bias", [True, False])
+def test_qkv_projection(use_bias):
+    """The projection should match a dense layer followed by a transpose."""
+    batch_size, seq_length, embed_dim, nb_heads = 2, 5, 8, 2
+    x = tf.random.uniform((batch_size, seq_length, embed_dim))
+
+    layer = ViTQKVProjection(embed_dim=embed_dim, nb_heads=nb_heads, use_bias=use_bias)
+    q, k, v = layer(x)
+    # Keys are returned transposed
+    y = tf.stack([q, tf.transpose(k, (0, 1, 3, 2)), v], axis=0)
+
+    dense = tf.keras.layers.Dense(units=3 * embed_dim, use_bias=use_bias)
+    dense(x)
+    dense.set_weights(layer.get_weights())
+    y_ref = dense(x)
+    y_ref = tf.reshape(y_ref, (batch_size, seq_length, 3, nb_heads, -1))
+    y_ref = tf.transpose(y_ref, (2, 0, 3, 1, 4))
+
+    assert k.shape == (batch_size, nb_heads, embed_dim // nb_heads, seq_length)
+    assert y.shape == (3, batch_size, nb_heads, seq_length, embed_dim // nb_heads)
+    assert np.allclose(y.numpy(), y_ref.numpy(), atol=1e-6)
+
+
+@pytest.mark.parametrize("attn_implementation", ["eager", "xla"])
+def test_grouped_query_attention(attn_implementation):
+    """
+    Grouped-query attention should be the same as multi-head attention, where key and
+    value heads are repeated within each group.
+    """
+    model = create_model("vit_test_model")
+    gqa_model = create_model(
+        "vit_test_model", nb_kv_heads=1, attn_implementation=attn_implementation
+    )
+    transfer_weights(model, gqa_model)
+    assert gqa_model.blocks[0].attn.qkv.kernel.shape == (4, 4 + 2 * 2)
+
+    # Transferring weights back repeats the averaged heads
+    transfer_weights(gqa_model, model)
+
+    img = np.random.rand(2, *model.cfg.input_size, model.cfg.in_channels)
+    y_1 = model(img).numpy()
+    y_2 = gqa_model(img).numpy()
+    assert np.allclose(y_1, y_2, rtol=1e-5, atol=1e-5)
+
+
+def test_grouped_query_attention_heads():
+    """The number of query heads has to be divisible by the number of KV heads."""
+    with pytest.raises(ValueError):
+        ViTConfig(nb_heads=12, nb_kv_heads=5)
+    with pytest.raises(ValueError):
+        create_model("vit_test_model", nb_kv_heads=3)
+
+
+def test_jit_compile_weight_names():
+    """Variables need to be created outside the compiled function to keep names."""
+    model = create_model("vit_test_model")
+    jit_model = create_model("vit_test_model", jit_compile=True)
+    assert [w.name for w in model.weights] == [w.name for w in jit_model.weights]
+
+
+def test_pad_classifier():
+    """Weights can be transferred back from a padded to an unpadded classifier."""
+    padded_model = create_model("vit_test_model", pad_classifier=True)
+    model = create_model("vit_test_model")
+    assert padded_model.head.units % 64 == 0
+    transfer_weights(padded_model, model)
+
+    img = np.random.rand(2, *model.cfg.input_size, model.cfg.in_channels)
+    y_1 = padded_model(img).numpy()
+    y_2 = model(img).numpy()
+    assert np.allclose(y_1, y_2, rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize("model_name", ["vit_test_model", "deit_test_model"])
+def test_dtype_policy(model_name):
+    """Models can use a different dtype policy without changing the global policy."""
+    # The bfloat16 error of individual logits depends on the random initialization,
+    # so we fix the seeds to make the test deterministic.
+    tf.keras.utils.set_random_seed(0)
+    global_policy = tf.keras.mixed_precision.global_policy().name
+    model = create_model(model_name, dtype_policy="float32")
+    bf16_model = create_model(model_name, dtype_policy="mixed_bfloat16")
+    transfer_weights(model, bf16_model)
+    assert tf.keras.mixed_precision.global_policy().name == global_policy
+    assert bf16_model.blocks[0].mlp.fc1.compute_dtype == "bfloat16"
+    assert bf16_model.blocks[0].mlp.fc1.kernel.dtype == "float32"
+
+    img = np.random.rand(2, *model.cfg.input_size, model.cfg.in_channels)
+    y_1 = model(img).numpy()
+    y_2 = bf16_model(img)
+    assert y_2.dtype == "bfloat16"
+    y_2 = tf.cast(y_2, tf.float32).numpy()
+    assert np.allclose(y_1, y_2, rtol=5e-2, atol=5e-2)
+
+
+@pytest.mark.parametrize("model_name", ["vit_test_model", "deit_test_model"])
+def test_fp8_quantization(model_name):
+    """Models with simulated FP8 quantization can be created and run."""
+    model = create_model(model_name)
+    fp8_model = create_model(model_name, quantization="fp8")
+    transfer_weights(model, fp8_model)
+    assert fp8_model.blocks[0].attn.qkv.quantization == "fp8"
+    assert fp8_model.blocks[0].mlp.fc1.quantization == "fp8"
+    # Quantized kernels are updated after transferring weights
+    qkv = fp8_model.blocks[0].attn.qkv
+    assert np.allclose(qkv.quantized_kernel.numpy(), fp8_quantize(qkv.kernel).numpy())
+    assert np.all(np.isfinite(fp8_model(fp8_model.dummy_inputs).numpy()))
+
+
+@pytest.mark.parametrize("model_name", ["vit_test_model", "deit_test_model"])
+def test_token_embedding(model_name):
+    """Padding patch embeddings should be the same as concatenating the tokens."""
+    model = create_model(model_name)
+    img = np.random.rand(2, *model.cfg.input_size, model.cfg.in_channels)
+    _, features = model(img, return_features=True)
+
+    x = model.patch_embed(img)
+    tokens = [model.cls_token] + ([model.dist_token] if model.cfg.distilled else [])
+    tokens = [tf.repeat(token, repeats=2, axis=0) for token in tokens]
+    x = tf.concat(tokens + [x], axis=1) + model.pos_embed
+    assert np.allclose(features["patch_embedding"].numpy(), x.numpy(), atol=1e-6)
+
+
+def test_export_serving():
+    """Exported signatures should give the same results as the model."""
+    model = create_model("vit_test_model")
+    img = np.random.rand(2, *model.cfg.input_size, model.cfg.in_channels)
+    img = tf.constant(img, dtype=tf.float32)
+    y_1 = model(img).numpy()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        model.export_serving(tmpdir, batch_sizes=(2,))
+        loaded = tf.saved_model.load(tmpdir)
+
+    assert set(loaded.signatures.keys()) == {"serving_default", "serving_bs2"}
+    for name in ["serving_default", "serving_bs2"]:
+        y_2 = list(loaded.signatures[name](input=img).values())[0].numpy()
+        assert np.allclose(y_1, y_2, rtol=1e-5, atol=1e-5)
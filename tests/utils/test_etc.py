@@ -1,6 +1,7 @@
 import pytest
+import tensorflow as tf
 
-from tfimm.utils import to_2tuple
+from tfimm.utils import shape_list, to_2tuple
 
 
 @pytest.mark.parametrize(
@@ -15,3 +16,14 @@ from tfimm.utils import to_2tuple
 )
 def test_to_2tuple(x, y):
     assert to_2tuple(x) == y
+
+
+def test_shape_list():
+    @tf.function(input_signature=[tf.TensorSpec((None, 4, 5), tf.float32)])
+    def _shape_list(x):
+        shape = shape_list(x)
+        assert isinstance(shape[0], tf.Tensor)
+        assert shape[1:] == [4, 5]
+        return shape[0]
+
+    assert _shape_list(tf.zeros((3, 4, 5))).numpy() == 3
@@ -6,15 +6,20 @@ Based on transformers/models/vit by HuggingFace
 
 Copyright 2021 Martins Bruveris
 """
+import logging
 from dataclasses import dataclass
-from typing import List, Optional, Tuple, Union
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import tensorflow as tf
 
 from tfimm.layers import (
     MLP,
     DropPath,
     PatchEmbeddings,
+    PatchProjection,
+    QuantizedDense,
     interpolate_pos_embeddings,
     norm_layer_factory,
 )
@@ -24,12 +29,14 @@ from tfimm.utils import (
     IMAGENET_DEFAULT_STD,
     IMAGENET_INCEPTION_MEAN,
     IMAGENET_INCEPTION_STD,
+    dtype_policy_scope,
+    shape_list,
 )
 
 from .resnetv2 import ResNetV2, ResNetV2Config, ResNetV2Stem
 
 # model_registry will add each entrypoint fn to this
-__all__ = ["ViT", "ViTBlock", "ViTConfig"]
+__all__ = ["ViT", "ViTBlock", "ViTConfig", "register_attn_implementation"]
 
 
 @dataclass
@@ -43,10 +50,12 @@ class ViTConfig(ModelConfig):
     embed_dim: int = 768
     nb_blocks: int = 12
     nb_heads: int = 12
+    nb_kv_heads: Optional[int] = None
     mlp_ratio: float = 4.0
     qkv_bias: bool = True
     representation_size: Optional[int] = None
     distilled: bool = False
+    pad_classifier: bool = False
     # Regularization
     drop_rate: float = 0.0
     attn_drop_rate: float = 0.0
@@ -54,6 +63,10 @@ class ViTConfig(ModelConfig):
     # Other parameters
     norm_layer: str = "layer_norm_eps_1e-6"
     act_layer: str = "gelu"
+    attn_implementation: str = "eager"
+    jit_compile: bool = False
+    dtype_policy: Optional[str] = None
+    quantization: Optional[str] = None
     # Parameters for inference
     interpolate_input: bool = False
     crop_pct: float = 0.875
@@ -78,18 +91,41 @@ class ViTConfig(ModelConfig):
         embed_dim: Embedding dimension
         nb_blocks: Depth of transformer (number of encoder blocks)
         nb_heads: Number of self-attention heads
+        nb_kv_heads: Number of key/value heads for grouped-query attention. If
+            ``None``, we use ``nb_heads``.
         mlp_ratio: Ratio of mlp hidden dim to embedding dim
         qkv_bias: Enable bias for qkv if True
         representation_size: Enable and set representation layer (pre-logits) to this
             value if set
         distilled: Model includes a distillation token and head as in DeiT models
+        pad_classifier: If ``True``, pad classifier head(s) to a multiple of 64 units
         drop_rate: Dropout rate
         attn_drop_rate: Attention dropout rate
         drop_path_rate: Dropout rate for stochastic depth
         norm_layer: Normalization layer
         act_layer: Activation function
+        attn_implementation: Attention implementation, ``"eager"``, ``"xla"`` or one
+            added via ``register_attn_implementation``
+        jit_compile: If ``True``, compile each transformer block with XLA
+        dtype_policy: Keras dtype policy for the model, e.g., ``mixed_bfloat16``. If
+            ``None``, we use the global policy.
+        quantization: Simulated quantization of QKV and MLP layers, ``None`` or
+            ``"fp8"``. Intended for inference only.
     """
 
+    def __post_init__(self):
+        if self.nb_kv_heads and self.nb_heads % self.nb_kv_heads != 0:
+            raise ValueError(
+                f"nb_heads={self.nb_heads} is not divisible by "
+                f"nb_kv_heads={self.nb_kv_heads}."
+            )
+        head_dim = self.embed_dim // self.nb_heads
+        if head_dim % 8 != 0:
+            logging.warning(
+                f"Head dimension {head_dim} of {self.name} is not a multiple of 8. "
+                "This can lead to inefficient matrix multiplications in attention."
+            )
+
     @property
     def nb_tokens(self) -> int:
         """Number of special tokens"""
@@ -113,9 +149,130 @@ class ViTConfig(ModelConfig):
         """Number of patches without class and distillation tokens."""
         return self.grid_size[0] * self.grid_size[1]
 
+    @property
+    def nb_head_units(self) -> int:
+        """
+        Number of units in classifier head(s), including padding. Padding to a multiple
+        of 64 gives better shaped matrix multiplications, e.g., for 21843 ImageNet-21k
+        classes. Padded logits are removed from the model output.
+        """
+        if self.pad_classifier:
+            return -(-self.nb_classes // 64) * 64
+        return self.nb_classes
+
     @property
     def transform_weights(self):
-        return {"pos_embed": ViT.transform_pos_embed}
+        transforms = {"pos_embed": ViT.transform_pos_embed}
+        weights = ["kernel", "bias"] if self.qkv_bias else ["kernel"]
+        for j in range(self.nb_blocks):
+            for weight in weights:
+                transforms[f"blocks/{j}/attn/qkv/{weight}"] = partial(
+                    ViT.transform_qkv, block=j, weight=weight
+                )
+        return transforms
+
+
+@tf.function(jit_compile=True)
+def _fused_attention(q, k, v, scale):
+    """
+    Computes ``softmax(scale * Q K^T) V`` as a single XLA cluster, so scaling, softmax
+    and both matrix multiplications can be fused and the intermediate attention matrix
+    does not need to be written out between separate kernels.
+
+    Args:
+        q: Queries, shape (B, G, N', D/H)
+        k: Transposed keys, shape (B, G, D/H, N)
+        v: Values, shape (B, G, N, D/H)
+        scale: Scaling factor applied to attention logits
+
+    Returns:
+        Attention output, shape (B, G, N', D/H)
+    """
+    q = q * scale
+    attn = tf.linalg.matmul(q, k)
+    attn = tf.nn.softmax(attn, axis=-1)
+    return tf.linalg.matmul(attn, v)
+
+
+# Implementations of the attention core, which can be selected via the config
+# parameter `attn_implementation`. The "eager" implementation is part of
+# `ViTMultiHeadAttention`, since it also handles attention dropout.
+_attn_implementations: Dict[str, Callable] = {"xla": _fused_attention}
+
+
+def register_attn_implementation(name: str, fn: Callable):
+    """
+    Registers an implementation of the attention core for ViT models, which can then be
+    selected via ``ViTConfig.attn_implementation=name``. This allows plugging in
+    optimized attention kernels without changing the model code. The built-in ``"xla"``
+    implementation compiles scaling, softmax and both matrix multiplications into one
+    XLA cluster. Models fall back to ``"eager"`` when attention dropout is active
+    during training.
+
+    Args:
+        name: Name of the implementation. Cannot be ``"eager"``.
+        fn: Function with the same signature as ``_fused_attention``, i.e.,
+            ``fn(q, k, v, scale)``, computing ``softmax(scale * Q K) V``. Note that
+            keys are passed transposed, i.e., with shape (B, G, D/H, N).
+    """
+    if name == "eager":
+        raise ValueError("Cannot overwrite the eager attention implementation.")
+    _attn_implementations[name] = fn
+
+
+class ViTQKVProjection(QuantizedDense):
+    """
+    Fused QKV projection.
+
+    The weights are those of a ``Dense(D + 2 * G * D/H)`` layer, which is
+    ``Dense(3 * D)`` for standard multi-head attention, so pretrained weights can be
+    loaded as usual. The projection is computed with a single matrix multiplication,
+    after which queries and values are transposed to the layout ``(B, H, N, D/H)``.
+    Keys are returned transposed, in the layout ``(B, G, D/H, N)``, so the attention
+    logits can be computed via ``Q K`` without transposing the second operand.
+    """
+
+    def __init__(
+        self,
+        embed_dim: int,
+        nb_heads: int,
+        use_bias: bool,
+        nb_kv_heads: Optional[int] = None,
+        quantization: Optional[str] = None,
+        **kwargs,
+    ):
+        nb_kv_heads = nb_kv_heads or nb_heads
+        head_dim = embed_dim // nb_heads
+        super().__init__(
+            units=embed_dim + 2 * nb_kv_heads * head_dim,
+            use_bias=use_bias,
+            quantization=quantization,
+            **kwargs,
+        )
+        self.embed_dim = embed_dim
+        self.nb_heads = nb_heads
+        self.nb_kv_heads = nb_kv_heads
+
+    def call(self, x):
+        # G (number of key/value heads), K (head dimension D/H)
+        batch_size, seq_length = shape_list(x)[:2]
+        head_dim = self.embed_dim // self.nb_heads
+        nb_heads = self.nb_heads + 2 * self.nb_kv_heads
+        if self.quantization is None:
+            x = tf.linalg.matmul(x, self.kernel)
+        else:
+            x = tf.linalg.matmul(self.quantize(x), self.quantized_kernel)
+        if self.use_bias:
+            x = tf.nn.bias_add(x, self.bias)
+        x = tf.reshape(x, (batch_size, seq_length, nb_heads, head_dim))
+        q, k, v = tf.split(
+            x, [self.nb_heads, self.nb_kv_heads, self.nb_kv_heads], axis=2
+        )
+        # Each slice gets its own permutation, so keys come out already transposed
+        q = tf.transpose(q, (0, 2, 1, 3))  # (B, H, N, D/H)
+        k = tf.transpose(k, (0, 2, 3, 1))  # (B, G, D/H, N)
+        v = tf.transpose(v, (0, 2, 1, 3))  # (B, G, N, D/H)
+        return q, k, v
 
 
 class ViTMultiHeadAttention(tf.keras.layers.Layer):
@@ -126,39 +283,78 @@ class ViTMultiHeadAttention(tf.keras.layers.Layer):
         qkv_bias: bool,
         drop_rate: float,
         attn_drop_rate: float,
+        nb_kv_heads: Optional[int] = None,
+        attn_implementation: str = "eager",
+        quantization: Optional[str] = None,
         **kwargs,
     ):
         super().__init__(**kwargs)
+        if attn_implementation != "eager" and (
+            attn_implementation not in _attn_implementations
+        ):
+            raise ValueError(
+                f"Unknown attention implementation: {attn_implementation}."
+            )
         self.embed_dim = embed_dim
         self.nb_heads = nb_heads
+        self.nb_kv_heads = nb_kv_heads or nb_heads
+        if nb_heads % self.nb_kv_heads != 0:
+            raise ValueError(
+                f"nb_heads={nb_heads} is not divisible by nb_kv_heads={nb_kv_heads}."
+            )
         self.qkv_bias = qkv_bias
         self.drop_rate = drop_rate
         self.attn_drop_rate = attn_drop_rate
+        self.attn_implementation = attn_implementation
+        self.quantization = quantization
 
         head_dim = embed_dim // nb_heads
         self.scale = head_dim**-0.5
 
-        self.qkv = tf.keras.layers.Dense(
-            units=3 * embed_dim, use_bias=qkv_bias, name="qkv"
+        self.qkv = ViTQKVProjection(
+            embed_dim=embed_dim,
+            nb_heads=nb_heads,
+            use_bias=qkv_bias,
+            nb_kv_heads=nb_kv_heads,
+            quantization=quantization,
+            name="qkv",
+        )
+        self.attn_drop = (
+            tf.keras.layers.Dropout(rate=attn_drop_rate)
+            if attn_drop_rate > 0.0
+            else tf.keras.layers.Activation("linear")  # Identity layer
         )
-        self.attn_drop = tf.keras.layers.Dropout(rate=attn_drop_rate)
         self.proj = tf.keras.layers.Dense(units=embed_dim, name="proj")
-        self.proj_drop = tf.keras.layers.Dropout(rate=drop_rate)
+        self.proj_drop = (
+            tf.keras.layers.Dropout(rate=drop_rate)
+            if drop_rate > 0.0
+            else tf.keras.layers.Activation("linear")  # Identity layer
+        )
 
     def call(self, x, training=False):
         # B (batch size), N (sequence length), D (embedding dimension),
-        # H (number of heads)
-        batch_size, seq_length = tf.unstack(tf.shape(x)[:2])
-        qkv = self.qkv(x)  # (B, N, 3*D)
-        qkv = tf.reshape(qkv, (batch_size, seq_length, 3, self.nb_heads, -1))
-        qkv = tf.transpose(qkv, (2, 0, 3, 1, 4))  # (3, B, H, N, D/H)
-        q, k, v = qkv[0], qkv[1], qkv[2]
-
-        attn = self.scale * tf.linalg.matmul(q, k, transpose_b=True)  # (B, H, N, N)
-        attn = tf.nn.softmax(attn, axis=-1)  # (B, H, N, N)
-        attn = self.attn_drop(attn, training=training)
-
-        x = tf.linalg.matmul(attn, v)  # (B, H, N, D/H)
+        # H (number of heads), G (number of key/value heads)
+        batch_size, seq_length = shape_list(x)[:2]
+        q, k, v = self.qkv(x)  # (B, H, N, D/H), (B, G, D/H, N), (B, G, N, D/H)
+        if self.nb_kv_heads != self.nb_heads:
+            # For grouped-query attention we stack the query heads of each group along
+            # the sequence axis instead of repeating keys and values.
+            q = tf.reshape(q, (batch_size, self.nb_kv_heads, -1, q.shape[-1]))
+
+        if self.attn_implementation != "eager" and not (
+            training and self.attn_drop_rate > 0.0
+        ):
+            attn_fn = _attn_implementations[self.attn_implementation]
+            x = attn_fn(q, k, v, self.scale)  # (B, G, H/G * N, D/H)
+        else:
+            # Scaling queries is cheaper than scaling the (B, H, N, N) attention logits
+            q = q * self.scale
+            attn = tf.linalg.matmul(q, k)  # (B, G, H/G * N, N)
+            attn = tf.nn.softmax(attn, axis=-1)  # (B, G, H/G * N, N)
+            attn = self.attn_drop(attn, training=training)
+            x = tf.linalg.matmul(attn, v)  # (B, G, H/G * N, D/H)
+
+        x = tf.reshape(x, (batch_size, self.nb_heads, seq_length, -1))  # (B, H, N, D/H)
         x = tf.transpose(x, (0, 2, 1, 3))  # (B, N, H, D/H)
         x = tf.reshape(x, (batch_size, seq_length, -1))  # (B, N, D)
 
@@ -179,11 +375,16 @@ class ViTBlock(tf.keras.layers.Layer):
         drop_path_rate: float,
         norm_layer: str,
         act_layer: str,
+        nb_kv_heads: Optional[int] = None,
+        attn_implementation: str = "eager",
+        jit_compile: bool = False,
+        quantization: Optional[str] = None,
         **kwargs,
     ):
         super().__init__(**kwargs)
         self.embed_dim = embed_dim
         self.nb_heads = nb_heads
+        self.nb_kv_heads = nb_kv_heads
         self.mlp_ratio = mlp_ratio
         self.qkv_bias = qkv_bias
         self.drop_rate = drop_rate
@@ -191,6 +392,9 @@ class ViTBlock(tf.keras.layers.Layer):
         self.drop_path_rate = drop_path_rate
         self.norm_layer = norm_layer
         self.act_layer = act_layer
+        self.attn_implementation = attn_implementation
+        self.jit_compile = jit_compile
+        self.quantization = quantization
         norm_layer = norm_layer_factory(norm_layer)
 
         self.norm1 = norm_layer(name="norm1")
@@ -200,6 +404,9 @@ class ViTBlock(tf.keras.layers.Layer):
             qkv_bias=qkv_bias,
             drop_rate=drop_rate,
             attn_drop_rate=attn_drop_rate,
+            nb_kv_heads=nb_kv_heads,
+            attn_implementation=attn_implementation,
+            quantization=quantization,
             name="attn",
         )
         self.drop_path = DropPath(drop_prob=drop_path_rate)
@@ -209,10 +416,22 @@ class ViTBlock(tf.keras.layers.Layer):
             embed_dim=embed_dim,
             drop_rate=drop_rate,
             act_layer=act_layer,
+            quantization=quantization,
             name="mlp",
         )
 
+        self._xla_forward = (
+            tf.function(self.forward, jit_compile=True) if jit_compile else None
+        )
+
     def call(self, x, training=False):
+        # Sublayers create their variables during the first call. We run that call
+        # uncompiled, because variables created while tracing lose their name scope.
+        if self.jit_compile and self.mlp.built:
+            return self._xla_forward(x, training=training)
+        return self.forward(x, training=training)
+
+    def forward(self, x, training=False):
         shortcut = x
         x = self.norm1(x, training=training)
         x = self.attn(x, training=training)
@@ -269,7 +488,7 @@ class HybridEmbeddings(tf.keras.layers.Layer):
             )
             self.backbone = ResNetV2(backbone_cfg, name="backbone")
 
-        self.projection = tf.keras.layers.Conv2D(
+        self.projection = PatchProjection(
             filters=embed_dim,
             kernel_size=patch_size,
             strides=patch_size,
@@ -282,8 +501,8 @@ class HybridEmbeddings(tf.keras.layers.Layer):
         x = self.projection(x)
 
         # Change the 2D spatial dimensions to a single temporal dimension.
-        batch_size, height, width = tf.unstack(tf.shape(x)[:3])
-        x = tf.reshape(tensor=x, shape=(batch_size, height * width, -1))
+        batch_size, height, width = shape_list(x)[:3]
+        x = tf.reshape(x, shape=(batch_size, height * width, self.projection.filters))
         return (x, (height, width)) if return_shape else x
 
 
@@ -293,79 +512,91 @@ class ViT(tf.keras.Model):
 
     def __init__(self, cfg: ViTConfig, *args, **kwargs):
         kwargs["name"] = kwargs.get("name", cfg.name)
-        super().__init__(*args, **kwargs)
-        self.nb_features = cfg.embed_dim  # For consistency with other models
-        self.norm_layer = norm_layer_factory(cfg.norm_layer)
-        self.cfg = cfg
-
-        if cfg.patch_layer == "patch_embeddings":
-            self.patch_embed = PatchEmbeddings(
-                patch_size=cfg.patch_size,
-                embed_dim=cfg.embed_dim,
-                norm_layer="",  # ViT does not use normalization in patch embeddings
-                name="patch_embed",
-            )
-        elif cfg.patch_layer == "hybrid_embeddings":
-            self.patch_embed = HybridEmbeddings(
-                in_channels=cfg.in_channels,
-                input_size=cfg.input_size,
-                nb_blocks=cfg.patch_nb_blocks,
-                patch_size=cfg.patch_size,
-                embed_dim=cfg.embed_dim,
-                drop_path_rate=cfg.drop_path_rate,
-                name="patch_embed",
-            )
-        else:
-            raise ValueError(f"Unknown patch layer: {cfg.patch_layer}.")
-        self.cls_token = None
-        self.dist_token = None
-        self.pos_embed = None
-        self.pos_drop = tf.keras.layers.Dropout(rate=cfg.drop_rate)
-
-        self.blocks = [
-            ViTBlock(
-                embed_dim=cfg.embed_dim,
-                nb_heads=cfg.nb_heads,
-                mlp_ratio=cfg.mlp_ratio,
-                qkv_bias=cfg.qkv_bias,
-                drop_rate=cfg.drop_rate,
-                attn_drop_rate=cfg.attn_drop_rate,
-                drop_path_rate=cfg.drop_path_rate,
-                norm_layer=cfg.norm_layer,
-                act_layer=cfg.act_layer,
-                name=f"blocks/{j}",
+        # Layers use the dtype policy that is active at creation time
+        with dtype_policy_scope(cfg.dtype_policy):
+            super().__init__(*args, **kwargs)
+            self.nb_features = cfg.embed_dim  # For consistency with other models
+            self.norm_layer = norm_layer_factory(cfg.norm_layer)
+            self.cfg = cfg
+
+            if cfg.patch_layer == "patch_embeddings":
+                self.patch_embed = PatchEmbeddings(
+                    patch_size=cfg.patch_size,
+                    embed_dim=cfg.embed_dim,
+                    norm_layer="",  # ViT does not use normalization in patch embeddings
+                    name="patch_embed",
+                )
+            elif cfg.patch_layer == "hybrid_embeddings":
+                self.patch_embed = HybridEmbeddings(
+                    in_channels=cfg.in_channels,
+                    input_size=cfg.input_size,
+                    nb_blocks=cfg.patch_nb_blocks,
+                    patch_size=cfg.patch_size,
+                    embed_dim=cfg.embed_dim,
+                    drop_path_rate=cfg.drop_path_rate,
+                    name="patch_embed",
+                )
+            else:
+                raise ValueError(f"Unknown patch layer: {cfg.patch_layer}.")
+            self.cls_token = None
+            self.dist_token = None
+            self.pos_embed = None
+            self.pos_drop = (
+                tf.keras.layers.Dropout(rate=cfg.drop_rate)
+                if cfg.drop_rate > 0.0
+                else tf.keras.layers.Activation("linear")  # Identity layer
             )
-            for j in range(cfg.nb_blocks)
-        ]
-        self.norm = self.norm_layer(name="norm")
 
-        # Some models have a representation layer on top of cls token
-        if cfg.representation_size:
-            if cfg.distilled:
-                raise ValueError(
-                    "Cannot combine distillation token and a representation layer."
+            self.blocks = [
+                ViTBlock(
+                    embed_dim=cfg.embed_dim,
+                    nb_heads=cfg.nb_heads,
+                    mlp_ratio=cfg.mlp_ratio,
+                    qkv_bias=cfg.qkv_bias,
+                    drop_rate=cfg.drop_rate,
+                    attn_drop_rate=cfg.attn_drop_rate,
+                    drop_path_rate=cfg.drop_path_rate,
+                    norm_layer=cfg.norm_layer,
+                    act_layer=cfg.act_layer,
+                    nb_kv_heads=cfg.nb_kv_heads,
+                    attn_implementation=cfg.attn_implementation,
+                    jit_compile=cfg.jit_compile,
+                    quantization=cfg.quantization,
+                    name=f"blocks/{j}",
                 )
-            self.nb_features = cfg.representation_size
-            self.pre_logits = tf.keras.layers.Dense(
-                units=cfg.representation_size, activation="tanh", name="pre_logits/fc"
-            )
-        else:
-            self.pre_logits = None
+                for j in range(cfg.nb_blocks)
+            ]
+            self.norm = self.norm_layer(name="norm")
+
+            # Some models have a representation layer on top of cls token
+            if cfg.representation_size:
+                if cfg.distilled:
+                    raise ValueError(
+                        "Cannot combine distillation token and a representation layer."
+                    )
+                self.nb_features = cfg.representation_size
+                self.pre_logits = tf.keras.layers.Dense(
+                    units=cfg.representation_size,
+                    activation="tanh",
+                    name="pre_logits/fc",
+                )
+            else:
+                self.pre_logits = None
 
-        # Classifier head(s)
-        self.head = (
-            tf.keras.layers.Dense(units=cfg.nb_classes, name="head")
-            if cfg.nb_classes > 0
-            else tf.keras.layers.Activation("linear")  # Identity layer
-        )
-        if cfg.distilled:
-            self.head_dist = (
-                tf.keras.layers.Dense(units=cfg.nb_classes, name="head_dist")
+            # Classifier head(s)
+            self.head = (
+                tf.keras.layers.Dense(units=cfg.nb_head_units, name="head")
                 if cfg.nb_classes > 0
                 else tf.keras.layers.Activation("linear")  # Identity layer
             )
-        else:
-            self.head_dist = None
+            if cfg.distilled:
+                self.head_dist = (
+                    tf.keras.layers.Dense(units=cfg.nb_head_units, name="head_dist")
+                    if cfg.nb_classes > 0
+                    else tf.keras.layers.Activation("linear")  # Identity layer
+                )
+            else:
+                self.head_dist = None
 
     def build(self, input_shape):
         self.cls_token = self.add_weight(
@@ -395,6 +626,61 @@ class ViT(tf.keras.Model):
     def dummy_inputs(self) -> tf.Tensor:
         return tf.zeros((1, *self.cfg.input_size, self.cfg.in_channels))
 
+    @property
+    def keys_to_ignore_on_load_missing(self) -> List[str]:
+        # Quantized kernels are computed from the kernels after loading weights
+        return ["quantized_kernel"]
+
+    def quantize_weights(self):
+        """Updates quantized kernels after the model weights have changed."""
+        for layer in self.submodules:
+            if isinstance(layer, QuantizedDense) and layer.built:
+                layer.quantize_weights()
+
+    def export_serving(
+        self,
+        path: str,
+        batch_sizes: Tuple[int, ...] = (1, 8, 32),
+        jit_compile: bool = True,
+    ):
+        """
+        Exports the model as a SavedModel for inference.
+
+        For each batch size ``n`` in ``batch_sizes`` the SavedModel has a signature
+        ``serving_bs{n}`` with a fixed input shape, compiled with XLA if
+        ``jit_compile`` is ``True``. Since the shapes are fixed, serving requests with
+        these batch sizes are never retraced and each signature is compiled at most
+        once per process. The ``serving_default`` signature accepts any batch size and
+        is not compiled with XLA, because XLA would compile one program per batch size.
+
+        Args:
+            path: Directory in which to save the model.
+            batch_sizes: Batch sizes for which to export fixed shape signatures.
+            jit_compile: If ``True``, fixed shape signatures are compiled with XLA.
+        """
+        if not self.built:
+            self(self.dummy_inputs)
+
+        def _serve(x):
+            return self(x, training=False)
+
+        input_shape = (*self.cfg.input_size, self.cfg.in_channels)
+        signatures = {
+            "serving_default": tf.function(
+                _serve,
+                input_signature=[tf.TensorSpec((None, *input_shape), name="input")],
+            )
+        }
+        for batch_size in batch_sizes:
+            signatures[f"serving_bs{batch_size}"] = tf.function(
+                _serve,
+                input_signature=[
+                    tf.TensorSpec((batch_size, *input_shape), name="input")
+                ],
+                jit_compile=jit_compile,
+            )
+        tf.saved_model.save(self, path, signatures=signatures)
+
     @property
     def feature_names(self) -> List[str]:
         return (
@@ -411,19 +697,37 @@ class ViT(tf.keras.Model):
             nb_tokens=self.cfg.nb_tokens,
         )
 
+    def transform_qkv(self, target_cfg: ViTConfig, block: int, weight: str):
+        """
+        Adapts the QKV projection weights to the number of key and value heads in
+        ``target_cfg``. Key and value heads are first repeated to one per query head
+        and then averaged within each group of the target config.
+        """
+        src = getattr(self.blocks[block].attn.qkv, weight).numpy()
+        src_kv_heads = self.cfg.nb_kv_heads or self.cfg.nb_heads
+        tgt_kv_heads = target_cfg.nb_kv_heads or target_cfg.nb_heads
+        if src_kv_heads == tgt_kv_heads:
+            return src
+
+        head_dim = self.cfg.embed_dim // self.cfg.nb_heads
+        q, kv = np.split(src, [self.cfg.embed_dim], axis=-1)
+        kv = np.reshape(kv, kv.shape[:-1] + (2, src_kv_heads, head_dim))
+        kv = np.repeat(kv, self.cfg.nb_heads // src_kv_heads, axis=-2)
+        kv = np.reshape(kv, kv.shape[:-2] + (tgt_kv_heads, -1, head_dim))
+        kv = np.mean(kv, axis=-2)
+        kv = np.reshape(kv, kv.shape[:-3] + (-1,))
+        return np.concatenate([q, kv], axis=-1)
+
     def forward_features(self, x, training=False, return_features=False):
         features = {}
-        batch_size = tf.shape(x)[0]
+        # If the static input size matches the config, we know that no interpolation
+        # of position embeddings is needed, even if the interpolation code path is
+        # enabled. This keeps the resize operation out of the graph.
+        fixed_size = tuple(x.shape[1:3]) == tuple(self.cfg.input_size)
 
         x, grid_size = self.patch_embed(x, return_shape=True)
-        cls_token = tf.repeat(self.cls_token, repeats=batch_size, axis=0)
-        if not self.cfg.distilled:
-            x = tf.concat((cls_token, x), axis=1)
-        else:
-            dist_token = tf.repeat(self.dist_token, repeats=batch_size, axis=0)
-            x = tf.concat((cls_token, dist_token, x), axis=1)
-        if not self.cfg.interpolate_input:
-            x = x + self.pos_embed
+        if not self.cfg.interpolate_input or fixed_size:
+            pos_embed = self.pos_embed
         else:
             pos_embed = interpolate_pos_embeddings(
                 self.pos_embed,
@@ -431,7 +735,17 @@ class ViT(tf.keras.Model):
                 tgt_grid_size=grid_size,
                 nb_tokens=self.cfg.nb_tokens,
             )
-            x = x + pos_embed
+        # Instead of concatenating the class and distillation tokens with the patch
+        # embeddings, we add them to the (batch-independent) position embeddings and
+        # pad the patch embeddings. This avoids materializing the concatenated tensor
+        # before adding the position embeddings and lets XLA fuse pad and add.
+        if not self.cfg.distilled:
+            tokens = self.cls_token
+        else:
+            tokens = tf.concat((self.cls_token, self.dist_token), axis=1)
+        nb_patches = shape_list(x)[1]
+        pos_embed = pos_embed + tf.pad(tokens, [[0, 0], [0, nb_patches], [0, 0]])
+        x = tf.pad(x, [[0, 0], [self.cfg.nb_tokens, 0], [0, 0]]) + pos_embed
         x = self.pos_drop(x, training=training)
         features["patch_embedding"] = x
 
@@ -463,6 +777,8 @@ class ViT(tf.keras.Model):
             y = self.head(x[:, 0])
             y_dist = self.head_dist(x[:, 1])
             x = tf.stack((y, y_dist), axis=1)
+        if self.cfg.pad_classifier and self.cfg.nb_classes > 0:
+            x = x[..., : self.cfg.nb_classes]  # Remove padded logits
         features["logits"] = x
         return (x, features) if return_features else x
 
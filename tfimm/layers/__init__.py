@@ -5,12 +5,15 @@ from .conv import PadConv2D, PadDepthwiseConv2D, StdConv2D  # noqa: F401
 from .drop import DropPath  # noqa: F401
 from .factory import act_layer_factory, norm_layer_factory  # noqa: F401
 from .initializers import FanoutInitializer  # noqa: F401
+from .norm import FusedLayerNormalization, fused_layer_normalize  # noqa: F401
+from .quantization import QuantizedDense, fp8_quantize  # noqa: F401
 from .transformers import (  # noqa:F401
     MLP,
     ConvMLP,
     GatedMLP,
     GluMLP,
     PatchEmbeddings,
+    PatchProjection,
     interpolate_pos_embeddings,
     interpolate_pos_embeddings_grid,
 )
@@ -1,12 +1,22 @@
 import tensorflow as tf
 
-from tfimm.layers.norm import Affine, GroupNormalization
+from tfimm.layers.norm import Affine, FusedLayerNormalization, GroupNormalization
+
+
+def gelu_tanh(x):
+    """
+    GELU activation using the tanh approximation. It is cheaper to compute than the
+    exact ``gelu``, which is used by pretrained models, and numerically close to it.
+    """
+    return tf.nn.gelu(x, approximate=True)
 
 
 def act_layer_factory(act_layer: str):
     """Returns a function that creates the required activation layer."""
     if act_layer in {"linear", "swish", "relu", "gelu", "sigmoid"}:
         return lambda **kwargs: tf.keras.layers.Activation(act_layer, **kwargs)
+    if act_layer == "gelu_tanh":
+        return lambda **kwargs: tf.keras.layers.Activation(gelu_tanh, **kwargs)
     if act_layer == "relu6":
         return lambda **kwargs: tf.keras.layers.ReLU(max_value=6, **kwargs)
     else:
@@ -44,6 +54,16 @@ def norm_layer_factory(norm_layer: str):
         bn_args = {"epsilon": 1e-6}
         return lambda **kwargs: bn_class(**bn_args, **kwargs)
 
+    elif norm_layer == "fused_layer_norm":
+        bn_class = FusedLayerNormalization
+        bn_args = {"epsilon": 1e-5}
+        return lambda **kwargs: bn_class(**bn_args, **kwargs)
+
+    elif norm_layer == "fused_layer_norm_eps_1e-6":
+        bn_class = FusedLayerNormalization
+        bn_args = {"epsilon": 1e-6}
+        return lambda **kwargs: bn_class(**bn_args, **kwargs)
+
     elif norm_layer == "affine":
         return Affine
 
@@ -0,0 +1,101 @@
+"""
+Simulated quantization for matrix multiplications.
+
+Inputs and weights are quantized to a low precision format and immediately dequantized
+again. When compiled with XLA on hardware with native FP8 support (e.g., NVIDIA Hopper
+GPUs), the dequantize-matmul pattern is rewritten into an FP8 GEMM with float32
+accumulation. On other hardware the results are numerically the same, but there is no
+speed-up.
+"""
+from typing import Optional
+
+import tensorflow as tf
+
+# Largest finite value representable in float8_e4m3fn
+FP8_E4M3_MAX = 448.0
+
+
+def _fp8_dtype():
+    """Returns the float8_e4m3fn dtype or None, if not supported by TF version."""
+    experimental = getattr(tf.dtypes, "experimental", None)
+    return getattr(experimental, "float8_e4m3fn", None)
+
+
+def fp8_quantize(x: tf.Tensor) -> tf.Tensor:
+    """
+    Quantizes ``x`` to ``float8_e4m3fn`` using per-tensor absmax scaling and
+    dequantizes it back to the dtype of ``x``.
+
+    Args:
+        x: Tensor to quantize.
+
+    Returns:
+        Tensor with the same shape and dtype as ``x``, but only containing values
+        representable in FP8 (up to scaling).
+    """
+    dtype = x.dtype
+    x = tf.cast(x, tf.float32)
+    amax = tf.reduce_max(tf.abs(x))
+    scale = FP8_E4M3_MAX / tf.maximum(amax, 1e-12)
+    x = tf.cast(x * scale, _fp8_dtype())
+    x = tf.cast(x, tf.float32) / scale
+    return tf.cast(x, dtype)
+
+
+class QuantizedDense(tf.keras.layers.Dense):
+    """
+    Dense layer with optional simulated quantization of inputs and kernel. Weights are
+    stored in full precision, so pretrained weights can be loaded as usual.
+
+    The kernel is quantized with per-tensor absmax scaling once, when the layer is
+    built, and stored in the non-trainable weight ``quantized_kernel``. Only inputs are
+    quantized in each forward pass. After changing the kernel, e.g., by loading
+    weights, ``quantize_weights()`` has to be called to update the quantized kernel.
+
+    Parameters:
+        quantization: Quantization format. Either ``None`` (no quantization) or
+            ``"fp8"``, which requires TF 2.13 or later.
+        **kwargs: Other arguments are passed to ``tf.keras.layers.Dense``.
+    """
+
+    def __init__(self, *args, quantization: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if quantization not in {None, "fp8"}:
+            raise ValueError(f"Unknown quantization: {quantization}.")
+        if quantization == "fp8" and _fp8_dtype() is None:
+            raise ValueError("FP8 quantization is not supported by this TF version.")
+        self.quantization = quantization
+        self.quantized_kernel = None
+
+    def build(self, input_shape):
+        super().build(input_shape)
+        if self.quantization is not None:
+            self.quantized_kernel = self.add_weight(
+                name="quantized_kernel",
+                shape=self.kernel.shape,
+                initializer="zeros",
+                trainable=False,
+            )
+            self.quantize_weights()
+
+    def quantize_weights(self):
+        """Quantizes the current kernel and stores it in ``quantized_kernel``."""
+        if self.quantization is not None:
+            self.quantized_kernel.assign(self.quantize(self.kernel))
+
+    def quantize(self, x: tf.Tensor) -> tf.Tensor:
+        """Applies simulated quantization to ``x``, if enabled."""
+        if self.quantization == "fp8":
+            return fp8_quantize(x)
+        return x
+
+    def call(self, x):
+        if self.quantization is None:
+            return super().call(x)
+
+        x = tf.linalg.matmul(self.quantize(x), self.quantized_kernel)
+        if self.use_bias:
+            x = tf.nn.bias_add(x, self.bias)
+        if self.activation is not None:
+            x = self.activation(x)
+        return x
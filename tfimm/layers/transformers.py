@@ -8,6 +8,8 @@ from typing import Optional, Tuple
 import tensorflow as tf
 
 from tfimm.layers.factory import act_layer_factory, norm_layer_factory
+from tfimm.layers.quantization import QuantizedDense
+from tfimm.utils import shape_list
 
 
 def interpolate_pos_embeddings(
@@ -76,6 +78,49 @@ def interpolate_pos_embeddings_grid(
     return tgt_pos_embed
 
 
+class PatchProjection(tf.keras.layers.Conv2D):
+    """
+    Convolutional layer used to project image patches to embeddings.
+
+    For non-overlapping patches, i.e., when ``strides == kernel_size``, the convolution
+    is equivalent to rearranging the image into patches of shape ``(P*P*C)`` followed
+    by a single matrix multiplication with the reshaped kernel, which is how we
+    compute it. Weights are the same as for ``tf.keras.layers.Conv2D``. In all other
+    cases we fall back to the convolution.
+    """
+
+    def call(self, x):
+        patch_size = self.kernel_size[0]
+        if not (
+            self.kernel_size == (patch_size, patch_size)
+            and self.strides == self.kernel_size
+            and self.padding == "valid"
+            and self.dilation_rate == (1, 1)
+            and self.groups == 1
+            and self.data_format == "channels_last"
+        ):
+            return super().call(x)
+
+        # Like "valid" convolution, we ignore pixels that don't fill a whole patch
+        batch_size, height, width = shape_list(x)[:3]
+        height, width = height // patch_size, width // patch_size
+        x = x[:, : height * patch_size, : width * patch_size]
+
+        if patch_size > 1:
+            # Space-to-depth orders channels as (row, column, channel) within each
+            # patch, which matches the order of the flattened kernel (P, P, C, D).
+            x = tf.nn.space_to_depth(x, block_size=patch_size)  # (B, H/P, W/P, P*P*C)
+        kernel = tf.reshape(self.kernel, (-1, self.filters))  # (P*P*C, D)
+        x = tf.reshape(x, (-1, kernel.shape[0]))
+        x = tf.linalg.matmul(x, kernel)
+        if self.use_bias:
+            x = tf.nn.bias_add(x, self.bias)
+        x = tf.reshape(x, (batch_size, height, width, self.filters))
+        if self.activation is not None:
+            x = self.activation(x)
+        return x
+
+
 class PatchEmbeddings(tf.keras.layers.Layer):
     """
     Image to Patch Embedding.
@@ -128,7 +173,7 @@ class PatchEmbeddings(tf.keras.layers.Layer):
         self.pad = tf.keras.layers.ZeroPadding2D(
             padding=self.padding if self.stride != self.patch_size else 0
         )
-        self.projection = tf.keras.layers.Conv2D(
+        self.projection = PatchProjection(
             filters=self.embed_dim,
             kernel_size=self.patch_size,
             strides=self.stride,
@@ -164,17 +209,24 @@ class PatchEmbeddings(tf.keras.layers.Layer):
         x = self.pad(x)
         x = self.projection(x)
 
-        batch_size, height, width = tf.unstack(tf.shape(x)[:3])
+        # Spatial dimensions are Python ints, if they are known statically. In that
+        # case the number of patches is a constant and only the batch size is dynamic.
+        batch_size, height, width = shape_list(x)[:3]
         if self.flatten:
             # Change the 2D spatial dimensions to a single temporal dimension.
-            x = tf.reshape(tensor=x, shape=(batch_size, height * width, -1))
+            x = tf.reshape(x, shape=(batch_size, height * width, self.embed_dim))
 
         x = self.norm(x, training=training)
         return (x, (height, width)) if return_shape else x
 
 
 class MLP(tf.keras.layers.Layer):
-    """MLP as used in Vision Transformer, MLP-Mixer and related networks"""
+    """
+    MLP as used in Vision Transformer, MLP-Mixer and related networks
+
+    If ``quantization`` is set, the two fully connected layers use simulated
+    quantization, see ``QuantizedDense``.
+    """
 
     def __init__(
         self,
@@ -184,26 +236,37 @@ class MLP(tf.keras.layers.Layer):
         act_layer: str,
         kernel_initializer: str = "glorot_uniform",
         bias_initializer: str = "zeros",
+        quantization: Optional[str] = None,
         **kwargs,
     ):
         super().__init__(**kwargs)
         act_layer = act_layer_factory(act_layer)
 
-        self.fc1 = tf.keras.layers.Dense(
+        self.fc1 = QuantizedDense(
             units=hidden_dim,
             kernel_initializer=kernel_initializer,
             bias_initializer=bias_initializer,
+            quantization=quantization,
             name="fc1",
         )
         self.act = act_layer()
-        self.drop1 = tf.keras.layers.Dropout(rate=drop_rate)
-        self.fc2 = tf.keras.layers.Dense(
+        self.drop1 = (
+            tf.keras.layers.Dropout(rate=drop_rate)
+            if drop_rate > 0.0
+            else tf.keras.layers.Activation("linear")  # Identity layer
+        )
+        self.fc2 = QuantizedDense(
             units=embed_dim,
             kernel_initializer=kernel_initializer,
             bias_initializer=bias_initializer,
+            quantization=quantization,
             name="fc2",
         )
-        self.drop2 = tf.keras.layers.Dropout(rate=drop_rate)
+        self.drop2 = (
+            tf.keras.layers.Dropout(rate=drop_rate)
+            if drop_rate > 0.0
+            else tf.keras.layers.Activation("linear")  # Identity layer
+        )
 
     def call(self, x, training=False):
         x = self.fc1(x)
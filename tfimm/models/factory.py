@@ -3,6 +3,7 @@ import re
 from copy import deepcopy
 from typing import Callable, Optional
 
+import numpy as np
 import tensorflow as tf
 from tensorflow.python.keras import backend as K
 
@@ -200,7 +201,10 @@ def transfer_weights(src_model: tf.keras.Model, dst_model: tf.keras.Model):
                 # We only keep the classifier if the number of classes is the same
                 # Otherwise the classifier is not copied over, i.e., we keep the
                 # initialization of dst_model.
-                weight_value_tuples.append((dst_weight, src_weights[w_name]))
+                src_weight = _transform_classifier(
+                    src_weights[w_name], dst_weight.shape[-1]
+                )
+                weight_value_tuples.append((dst_weight, src_weight))
 
         elif var_name == dst_first_conv:
             src_weight = _transform_first_conv(
@@ -214,6 +218,13 @@ def transfer_weights(src_model: tf.keras.Model, dst_model: tf.keras.Model):
             src_weight = transform_weights[var_name](src_model, dst_model.cfg)
             weight_value_tuples.append((dst_weight, src_weight))
 
+        elif w_name.replace(":0", "") in transform_weights:
+            # Transforms can also be specified for individual weights of a layer,
+            # e.g., "blocks/0/attn/qkv/kernel".
+            transform = transform_weights[w_name.replace(":0", "")]
+            src_weight = transform(src_model, dst_model.cfg)
+            weight_value_tuples.append((dst_weight, src_weight))
+
         else:
             # All other weights are simply copied over
             weight_value_tuples.append((dst_weight, src_weights[w_name]))
@@ -221,6 +232,11 @@ def transfer_weights(src_model: tf.keras.Model, dst_model: tf.keras.Model):
     # This modifies weights in place
     K.batch_set_value(weight_value_tuples)
 
+    # Some models store weights derived from other weights, e.g., quantized kernels,
+    # which need to be recomputed.
+    if hasattr(dst_model, "quantize_weights"):
+        dst_model.quantize_weights()
+
 
 def _strip_prefix(name):
     """
@@ -244,6 +260,22 @@ def _get_layer_name(name):
     return name
 
 
+def _transform_classifier(weight, nb_units):
+    """
+    Adapts classifier `weight` to have `nb_units` output units by truncating or
+    zero-padding along the last axis. This is needed when models pad the classifier
+    to a multiple of some number for efficiency. The padded units are not used for
+    predictions.
+    """
+    src_units = weight.shape[-1]
+    if nb_units < src_units:
+        weight = weight[..., :nb_units]
+    elif nb_units > src_units:
+        paddings = [[0, 0]] * (len(weight.shape) - 1) + [[0, nb_units - src_units]]
+        weight = np.pad(weight, paddings)
+    return weight
+
+
 def _transform_first_conv(weight, in_channels):
     """
     Adapts `weight` to have `in_channels` either by truncating or by repeating
@@ -8,6 +8,7 @@ Copyright 2021 Martins Bruveris
 """
 
 import fnmatch
+import logging
 import re
 import sys
 from collections import defaultdict
@@ -24,19 +25,20 @@ __all__ = [
     "register_model",
 ]
 
+# Functions returning model class and config, indexed by model name
+_model_entrypoints = {}
+# Model classes and configs are created lazily when a model is first used, so that
+# importing the library does not require calling all entrypoints.
 _model_class = {}
 _model_config = {}
 # Dict of sets to check membership of model in module
 _module_to_models = defaultdict(set)
-_model_has_pretrained = set()  # Model names that have pretrained weight url present
 
 
 def register_model(fn):
-    # Get model class and model config
-    cls, cfg = fn()
-    model_name = cfg.name
-    if fn.__name__ != model_name:
-        raise ValueError(f"Model name({model_name}) != function name ({fn.__name__}).")
+    # The model name is given by the function name. We don't call the function here;
+    # this happens when the model class or config are needed the first time.
+    model_name = fn.__name__
 
     # Lookup module, where model is defined
     mod = sys.modules[fn.__module__]
@@ -49,16 +51,28 @@ def register_model(fn):
     else:
         mod.__all__ = [model_name]
 
-    # Add entries to registry dict/sets
-    _model_class[model_name] = cls
-    _model_config[model_name] = deepcopy(cfg)
+    # Add entries to registry dict/sets. If a model is registered again, we discard
+    # the previously created class and config.
+    _model_entrypoints[model_name] = fn
+    _model_class.pop(model_name, None)
+    _model_config.pop(model_name, None)
     _module_to_models[module_name].add(model_name)
-    if cfg.url:  # If URL is non-null, we assume it points to pretrained weights
-        _model_has_pretrained.add(model_name)
 
     return fn
 
 
+def _resolve_model(model_name):
+    """Calls the model entrypoint, if needed, and caches model class and config."""
+    if model_name in _model_class:
+        return
+
+    cls, cfg = _model_entrypoints[model_name]()
+    if cfg.name != model_name:
+        raise ValueError(f"Model name({cfg.name}) != function name ({model_name}).")
+    _model_class[model_name] = cls
+    _model_config[model_name] = deepcopy(cfg)
+
+
 def _natural_key(string_):
     return [int(s) if s.isdigit() else s for s in re.split(r"(\d+)", string_.lower())]
 
@@ -87,7 +101,7 @@ def list_models(
     if module:
         all_models = list(_module_to_models[module])
     else:
-        all_models = _model_class.keys()
+        all_models = _model_entrypoints.keys()
 
     if name_filter:
         if not isinstance(name_filter, (tuple, list)):
@@ -109,7 +123,7 @@ def list_models(
                 models = models.difference(exclude_models)
 
     if pretrained is True:
-        models = _model_has_pretrained.intersection(models)
+        models = {model for model in models if _is_model_pretrained_safe(model)}
     elif pretrained == "timm":
         models = models.intersection(_timm_pretrained_models())
 
@@ -118,16 +132,18 @@ def list_models(
 
 def is_model(model_name):
     """Check if a model name exists"""
-    return model_name in _model_class
+    return model_name in _model_entrypoints
 
 
 def model_class(model_name):
     """Fetch a model entrypoint for specified model name"""
+    _resolve_model(model_name)
     return _model_class[model_name]
 
 
 def model_config(model_name):
     """Fetch a model config for specified model name"""
+    _resolve_model(model_name)
     return _model_config[model_name]
 
 
@@ -148,7 +164,23 @@ def is_model_in_modules(model_name, module_names):
 
 
 def is_model_pretrained(model_name):
-    return model_name in _model_has_pretrained
+    if model_name not in _model_entrypoints:
+        return False
+    # If URL is non-null, we assume it points to pretrained weights
+    return bool(model_config(model_name).url)
+
+
+def _is_model_pretrained_safe(model_name):
+    """
+    Same as `is_model_pretrained`, but a model whose entrypoint cannot be resolved is
+    skipped with a warning, so that one broken entrypoint does not break listing all
+    other models.
+    """
+    try:
+        return is_model_pretrained(model_name)
+    except Exception as e:
+        logging.warning(f"Could not resolve model {model_name}: {e}")
+        return False
 
 
 def _timm_pretrained_models():
@@ -7,5 +7,10 @@ from .cache import (  # noqa: F401
     set_model_cache,
 )
 from .constants import *  # noqa: F401
-from .etc import make_divisible, to_2tuple  # noqa: F401
+from .etc import (  # noqa: F401
+    dtype_policy_scope,
+    make_divisible,
+    shape_list,
+    to_2tuple,
+)
 from .timm import load_pth_url_weights, load_timm_weights  # noqa: F401
@@ -1,5 +1,8 @@
 import collections.abc
-from typing import Iterable, Optional, Tuple, TypeVar, Union
+import contextlib
+from typing import Iterable, List, Optional, Tuple, TypeVar, Union
+
+import tensorflow as tf
 
 T = TypeVar("T")
 
@@ -24,3 +27,33 @@ def make_divisible(
     if new_value < round_limit * value:
         new_value += divisor
     return new_value
+
+
+def shape_list(x: tf.Tensor) -> List[Union[int, tf.Tensor]]:
+    """
+    Returns the shape of ``x`` as a list. Dimensions that are known statically are
+    returned as Python ints, the others as scalar tensors. Static dimensions allow
+    TF (and XLA) to treat shapes of downstream ops as constants.
+    """
+    static = x.shape.as_list()
+    dynamic = tf.shape(x)
+    return [dynamic[j] if dim is None else dim for j, dim in enumerate(static)]
+
+
+@contextlib.contextmanager
+def dtype_policy_scope(policy: Optional[str]):
+    """
+    Context manager to temporarily set the global Keras dtype policy. Layers created
+    within the scope will use ``policy`` unless a dtype is specified explicitly. If
+    ``policy`` is ``None``, the global policy is not changed.
+    """
+    if policy is None:
+        yield
+        return
+
+    old_policy = tf.keras.mixed_precision.global_policy()
+    tf.keras.mixed_precision.set_global_policy(policy)
+    try:
+        yield
+    finally:
+        tf.keras.mixed_precision.set_global_policy(old_policy)